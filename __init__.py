@@ -4,24 +4,61 @@ chopsticks package initializer.
 Also exposes a compatibility alias so user pkg.py can do:
 from core.package import Package
 from core.action import RunCommand
+
+Submodules behind the alias are imported lazily, on first use.
 """
 
 from __future__ import annotations
 
 import importlib
 import sys
+from importlib.machinery import ModuleSpec
+from types import ModuleType
+
+_CORE = f"{__name__}.core"
+
+
+class _CoreAlias(ModuleType):
+    """Stand-in for the "core" module resolving attributes from chopsticks.core."""
+
+    __path__: list[str] = []  # marks the alias as a package
+
+    def __getattr__(self, name: str) -> ModuleType:
+        # Only called on a miss: resolve once, then cache on the alias and in
+        # sys.modules so later "core.X" lookups and imports skip this path.
+        try:
+            mod = importlib.import_module(f"{_CORE}.{name}")
+        except ModuleNotFoundError as e:
+            raise AttributeError(f"module 'core' has no attribute {name!r}") from e
+        setattr(self, name, mod)
+        sys.modules.setdefault(f"core.{name}", mod)
+        return mod
 
-# Expose "core" namespace as an alias of "chopsticks.core"
-if "core" not in sys.modules:
-    core_pkg = importlib.import_module("chopsticks.core")
-    sys.modules["core"] = core_pkg
-
-# Also ensure submodules resolve correctly when importing "core.something"
-for sub in ("action", "package", "executor", "state", "depsolver", "errors"):
-    full = f"chopsticks.core.{sub}"
-    try:
-        mod = importlib.import_module(full)
-        sys.modules[f"core.{sub}"] = mod
-    except ModuleNotFoundError:
-        pass
 
+class _CoreAliasFinder:
+    """Meta path finder/loader resolving "core.X" imports to chopsticks.core.X."""
+
+    def find_spec(self, fullname, path, target=None):
+        if not fullname.startswith("core."):
+            return None
+        real = f"{_CORE}.{fullname[5:]}"
+        try:
+            mod = importlib.import_module(real)
+        except ModuleNotFoundError as e:
+            if e.name != real:
+                raise
+            return None
+        return ModuleSpec(fullname, self, loader_state=mod.__spec__)
+
+    def create_module(self, spec):
+        return sys.modules[spec.loader_state.name]
+
+    def exec_module(self, module):
+        # The import system stamps the alias spec onto the shared module; put
+        # the real one back so the module still reports chopsticks.core.X.
+        module.__spec__ = module.__spec__.loader_state
+
+
+# Expose "core" namespace as an alias of "chopsticks.core"
+if sys.modules.setdefault("core", _CoreAlias("core")).__class__ is _CoreAlias:
+    sys.meta_path.append(_CoreAliasFinder())
@@ -1,12 +1,89 @@
 from __future__ import annotations
 
 import argparse
-from typing import List
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
 
+from ..core.action import Action
 from ..core.depsolver import resolve_install_order, resolve_uninstall_order
 from ..core.executor import Executor
+from ..core.package import Package
 from ..core.state import State
-from ..repo.loader import load_package
+from ..repo.loader import load_package, repo_index
+
+# Package directory names; a leading dot is rejected so "." / ".." can't escape the repo
+_NAME_RE = re.compile(r"[A-Za-z0-9_+-][A-Za-z0-9_.+-]*")
+
+# Snapshot of the repo directory, taken once per command by _index_repo()
+_repo_index: Optional[Dict[str, os.DirEntry]] = None
+
+
+def _index_repo() -> None:
+    global _repo_index
+    _repo_index = repo_index()
+
+
+@lru_cache(maxsize=None)
+def _cached_lookup(name: str) -> Package:
+    return load_package(name, index=_repo_index)
+
+
+def _clean_targets(names: List[str]) -> Optional[List[str]]:
+    """Drop duplicate names (keeping order); report and return None if any is invalid."""
+    targets = list(dict.fromkeys(names))
+    invalid = [t for t in targets if not _NAME_RE.fullmatch(t)]
+    if invalid:
+        print(f"Invalid package name: {', '.join(invalid)}")
+        return None
+    return targets
+
+
+_INSTALL_VERBS: Dict[str, str] = {"install": "Installing", "update": "Updating"}
+_UNINSTALL_VERBS: Dict[str, str] = {"uninstall": "Uninstalling"}
+
+
+def _actions_for(pkg: Package, op: str) -> Sequence[Action]:
+    if op == "install":
+        return pkg.install
+    if op == "update":
+        return pkg.update
+    return pkg.uninstall
+
+
+def _execute_plan(
+    plan: List[Tuple[Package, str]],
+    st: State,
+    ex: Executor,
+    dry_run: bool,
+    no_confirm: bool,
+    op_verbs: Dict[str, str],
+) -> int:
+    # State is only updated in memory per package and written once, also when
+    # a later package aborts the run, so finished packages are not forgotten
+    try:
+        for pkg, op in plan:
+            # Uninstall reports the version that is actually installed
+            version = (
+                st.installed[pkg.name].version if op == "uninstall" else pkg.version
+            )
+            print(f"{op_verbs[op]} {pkg.name}-{version}")
+            actions = _actions_for(pkg, op)
+            if dry_run:
+                for a in actions:
+                    print(
+                        f"  DRY-RUN: {a.__class__.__name__} -> {getattr(a, 'describe', lambda: '')()}"
+                    )
+                continue
+            ex.run(actions, no_confirm)
+            if op == "uninstall":
+                st.mark_uninstalled(pkg.name)
+            else:
+                st.mark_installed(pkg.name, pkg.version)
+    finally:
+        st.save()
+    return 0
 
 
 def cmd_list(_: argparse.Namespace) -> int:
@@ -21,76 +98,53 @@ def cmd_list(_: argparse.Namespace) -> int:
 
 
 def cmd_install(args: argparse.Namespace) -> int:
-    targets: List[str] = args.packages
+    targets = _clean_targets(args.packages)
+    if targets is None:
+        return 1
 
+    _index_repo()
     st = State()
     st.load()
 
-    plan = resolve_install_order(
-        targets, load_package, {k: v.version for k, v in st.installed.items()}
-    )
+    plan = resolve_install_order(targets, _cached_lookup, st.version_map())
     if not plan:
         print("All targets are up-to-date.")
         return 0
 
-    ex = Executor()
-    for pkg, op in plan:
-        print(
-            f"Installing {pkg.name}-{pkg.version}"
-            if op == "install"
-            else f"Updating {pkg.name}-{pkg.version}"
-        )
-        actions = pkg.install if op == "install" else pkg.update
-        if args.dry_run:
-            for a in actions:
-                print(
-                    f"  DRY-RUN: {a.__class__.__name__} -> {getattr(a, 'describe', lambda: '')()}"
-                )
-            continue
-        ex.run(actions, args.no_confirm)
-        st.mark_installed(pkg.name, pkg.version)
-
-    st.save()
-    return 0
+    with Executor() as ex:
+        return _execute_plan(plan, st, ex, args.dry_run, args.no_confirm, _INSTALL_VERBS)
 
 
 def cmd_uninstall(args: argparse.Namespace) -> int:
-    targets: List[str] = args.packages
+    targets = _clean_targets(args.packages)
+    if targets is None:
+        return 1
 
+    _index_repo()
     st = State()
     st.load()
-    installed = {k: v.version for k, v in st.installed.items()}
+    installed = st.version_map()
     missing = [t for t in targets if t not in installed]
     if missing:
         print(f"Not installed: {', '.join(missing)}")
         return 1
 
     try:
-        plan = resolve_uninstall_order(targets, load_package, installed)
+        plan = resolve_uninstall_order(targets, _cached_lookup, installed)
     except Exception as e:
         print(str(e))
         return 1
 
-    ex = Executor()
-    for pkg, _ in plan:
-        print(f"Uninstalling {pkg.name}-{installed[pkg.name]}")
-        actions = pkg.uninstall
-        if args.dry_run:
-            for a in actions:
-                print(
-                    f"  DRY-RUN: {a.__class__.__name__} -> {getattr(a, 'describe', lambda: '')()}"
-                )
-            continue
-        ex.run(actions, args.no_confirm)
-        st.mark_uninstalled(pkg.name)
-
-    st.save()
-    return 0
+    with Executor() as ex:
+        return _execute_plan(plan, st, ex, args.dry_run, args.no_confirm, _UNINSTALL_VERBS)
 
 
 def cmd_update(args: argparse.Namespace) -> int:
-    targets: List[str] = args.packages
+    targets = _clean_targets(args.packages)
+    if targets is None:
+        return 1
 
+    _index_repo()
     st = State()
     st.load()
 
@@ -100,34 +154,15 @@ def cmd_update(args: argparse.Namespace) -> int:
             print("No packages installed.")
             return 0
 
-    plan = resolve_install_order(
-        targets, load_package, {k: v.version for k, v in st.installed.items()}
-    )
+    plan = resolve_install_order(targets, _cached_lookup, st.version_map())
     # Filter only updates (or installs if not installed to get on latest)
     plan = [(p, op) for (p, op) in plan if op in ("update", "install")]
     if not plan:
         print("All targets are up-to-date.")
         return 0
 
-    ex = Executor()
-    for pkg, op in plan:
-        print(
-            f"Updating {pkg.name}-{pkg.version}"
-            if op == "update"
-            else f"Installing {pkg.name}-{pkg.version}"
-        )
-        actions = pkg.update if op == "update" else pkg.install
-        if args.dry_run:
-            for a in actions:
-                print(
-                    f"  DRY-RUN: {a.__class__.__name__} -> {getattr(a, 'describe', lambda: '')()}"
-                )
-            continue
-        ex.run(actions, args.no_confirm)
-        st.mark_installed(pkg.name, pkg.version)
-
-    st.save()
-    return 0
+    with Executor() as ex:
+        return _execute_plan(plan, st, ex, args.dry_run, args.no_confirm, _INSTALL_VERBS)
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -2,14 +2,22 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
+from typing import Dict, Optional
 
-REPO_DIR = Path("~/.config/chopsticks/repo/").expanduser().resolve()
+
+def _upath(s: str) -> Path:
+    # Pure string normalization; unlike Path.resolve() this doesn't stat every parent
+    return Path(os.path.normpath(os.path.expanduser(s)))
+
+
+REPO_DIR = _upath("~/.config/chopsticks/repo/")
 
 # State file path (installed packages)
-STATE_FILE = Path("~/.config/chopsticks/state.json").expanduser().resolve()
+STATE_FILE = _upath("~/.config/chopsticks/state.json")
 
 # Config directory
-CONFIG_DIR = Path("~/.config/chopsticks/config").expanduser().resolve()
+CONFIG_DIR = _upath("~/.config/chopsticks/config")
 
 # Command execution defaults
-SHELL_ENV = os.environ.copy()
+# None lets child processes inherit os.environ instead of a copy taken at import.
+SHELL_ENV: Optional[Dict[str, str]] = None
@@ -1,15 +1,36 @@
 from __future__ import annotations
 
+import mmap
 import os
 import shlex
+import stat
 import subprocess
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Optional, Sequence
+from typing import List, NamedTuple, Optional, Sequence
 
 from ..config import SHELL_ENV
-from ..utils.fs import atomic_write, ensure_dir, is_link_to, read_text
-from ..utils.sysutils import run_systemctl, run_ufw
+from ..utils.fs import (
+    atomic_write,
+    ensure_dir,
+    forget_dir,
+    is_empty_dir,
+    is_link_to,
+    read_text,
+    tail_bytes,
+    try_lstat,
+)
+from ..utils.sysutils import active_shell, have, run_spawn, run_systemctl, run_ufw
+
+
+def _exists(path: Path) -> bool:
+    """Path.exists() in one lstat for anything but symlinks (which are followed)."""
+    st = try_lstat(path)
+    if st is None:
+        return False
+    if stat.S_ISLNK(st.st_mode):
+        return os.path.exists(path)
+    return True
 
 
 class Action(ABC):
@@ -26,6 +47,107 @@ class Action(ABC):
         return self.__class__.__name__
 
 
+def _has_line(text: str, needle: str) -> bool:
+    """True if `text` contains the line `needle` ("\\n" + line + "\\n") as a whole line."""
+    if not text:
+        return False
+    if "\r" in text:
+        # CRLF/CR line endings: let splitlines() find the line breaks
+        return needle[1:-1] in text.splitlines()
+    return needle in ("\n" + text if text.endswith("\n") else "\n" + text + "\n")
+
+
+def _marker_line(text: str, marker: str, pos: int) -> tuple[int, int] | None:
+    """Offsets of the first line at or after `pos` equal to `marker` once stripped.
+
+    Returns (line start, line end); the end excludes the newline.
+    """
+    i = text.find(marker, pos)
+    while i != -1:
+        start = text.rfind("\n", 0, i) + 1
+        stop = text.find("\n", i)
+        if stop == -1:
+            stop = len(text)
+        if start >= pos and text[start:stop].strip() == marker:
+            return start, stop
+        i = text.find(marker, i + 1)
+    return None
+
+
+def _block_span(text: str, begin: str, end: str) -> tuple[int, int, int, int] | None:
+    """Locate a managed block by its marker lines without splitting the text.
+
+    Returns (start, body_start, body_end, stop): the block is text[start:stop]
+    (including the END line's newline) and its content is text[body_start:body_end].
+    """
+    b = _marker_line(text, begin, 0)
+    if b is None:
+        return None
+    e = _marker_line(text, end, b[1] + 1)
+    if e is None:
+        # malformed (begin without end) -> treat as no block
+        return None
+    stop = e[1] + 1 if e[1] < len(text) else e[1]
+    return b[0], b[1] + 1, e[0], stop
+
+
+class _Patch(NamedTuple):
+    """Reverse patch: the edited text has `inserted` at `offset` where `replaced` was."""
+
+    offset: int
+    replaced: str
+    inserted: str
+
+
+def _make_patch(old: str, new: str) -> _Patch:
+    """Diff old and new down to the span between their common prefix and suffix."""
+    # Bisect on slice equality so the comparisons run as C memcmp
+    lo, hi = 0, min(len(old), len(new))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[lo:mid] == new[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    prefix = lo
+    lo, hi = 0, min(len(old), len(new)) - prefix
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old[len(old) - mid : len(old) - lo] == new[len(new) - mid : len(new) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return _Patch(prefix, old[prefix : len(old) - lo], new[prefix : len(new) - lo])
+
+
+def _revert(path: Path, patch: _Patch, mode: int = 0o644) -> None:
+    """Undo patch on path, unless the file no longer holds the edited text."""
+    cur = read_text(path)
+    end = patch.offset + len(patch.inserted)
+    if cur is None or cur[patch.offset : end] != patch.inserted:
+        return
+    atomic_write(
+        path, (cur[: patch.offset] + patch.replaced + cur[end:]).encode("utf-8"), mode
+    )
+
+
+class TextEdit(Action):
+    """An action that rewrites a single text file.
+
+    `_needs`/`_edit` express it as a pure function of the file's current content
+    (None when the file is missing), so consecutive edits of one file can be
+    applied in memory and written once (see CoalescedTextEdit).
+    """
+
+    path: Path
+
+    @abstractmethod
+    def _needs(self, text: Optional[str]) -> bool: ...
+
+    @abstractmethod
+    def _edit(self, text: Optional[str]) -> str: ...
+
+
 # -------- Command actions --------
 class RunCommand(Action):
     def __init__(self, cmd: str | Sequence[str], cwd: Optional[str] = None) -> None:
@@ -34,30 +156,62 @@ class RunCommand(Action):
         else:
             self.cmd = list(cmd)
         self.cwd = cwd
+        self._desc: Optional[str] = None
 
     def check(self) -> bool:
         return True
 
     def run(self) -> None:
-        subprocess.run(self.cmd, check=True, cwd=self.cwd, env=SHELL_ENV)
+        run_spawn(self.cmd, check=True, cwd=self.cwd, env=SHELL_ENV)
 
     def rollback(self) -> None:
         pass
 
     def describe(self) -> str:
-        return f"RunCommand({shlex.join(self.cmd)})"
+        # Prompts, skip and failure messages may ask several times; quote once
+        if self._desc is None:
+            self._desc = f"RunCommand({shlex.join(self.cmd)})"
+        return self._desc
+
+
+# Scripts containing any of these need a real shell to be interpreted
+_SHELL_CHARS = frozenset("|&;<>$`\\\"'*?~#()[]{}\n")
+# Words that only mean something to a shell
+_SHELL_WORDS = frozenset(
+    "! . : [[ alias break case cd continue eval exec exit export for function if "
+    "local read readonly return set shift source test trap ulimit umask unset "
+    "until wait while".split()
+)
 
 
 class RunShell(Action):
     def __init__(self, script: str, cwd: Optional[str] = None) -> None:
         self.script = script
         self.cwd = cwd
+        # A plain "cmd arg ..." script can be spawned directly, without a shell
+        self._argv: Optional[list[str]] = None
+        if not _SHELL_CHARS.intersection(script):
+            # sh splits words on blanks only, not on \r, \f or Unicode spaces
+            argv = [w for w in script.replace("\t", " ").split(" ") if w]
+            if argv and argv[0] not in _SHELL_WORDS and "=" not in argv[0]:
+                self._argv = argv
 
     def check(self) -> bool:
         return True
 
     def run(self) -> None:
-        subprocess.run(self.script, shell=True, check=True, cwd=self.cwd, env=SHELL_ENV)
+        if self._argv is not None and have(self._argv[0]):
+            run_spawn(self._argv, check=True, cwd=self.cwd, env=SHELL_ENV)
+            return
+        # Prefer the executor's shell session over spawning /bin/sh per script
+        shell = active_shell()
+        rc = shell.run(self.script, self.cwd) if shell is not None else None
+        if rc is None:
+            run_spawn(
+                ["/bin/sh", "-c", self.script], check=True, cwd=self.cwd, env=SHELL_ENV
+            )
+        elif rc != 0:
+            raise subprocess.CalledProcessError(rc, self.script)
 
     def rollback(self) -> None:
         pass
@@ -74,16 +228,19 @@ class CreateDir(Action):
         self.created = False
 
     def check(self) -> bool:
-        return not self.path.exists()
+        return not _exists(self.path)
 
     def run(self) -> None:
+        # check() found it missing, so a cached entry for it would be stale
+        forget_dir(self.path)
         ensure_dir(self.path, mode=self.mode, exist_ok=True)
         self.created = True
 
     def rollback(self) -> None:
         try:
-            if self.created and self.path.exists() and not any(self.path.iterdir()):
+            if self.created and is_empty_dir(self.path):
                 self.path.rmdir()
+                forget_dir(self.path)
         except Exception:
             pass
 
@@ -94,12 +251,13 @@ class DeleteDir(Action):
         self._removed = False
 
     def check(self) -> bool:
-        return self.path.exists()
+        return _exists(self.path)
 
     def run(self) -> None:
         # Delete empty dir only (safer)
-        if self.path.is_dir() and not any(self.path.iterdir()):
+        if is_empty_dir(self.path):
             self.path.rmdir()
+            forget_dir(self.path)
             self._removed = True
 
     def rollback(self) -> None:
@@ -113,7 +271,7 @@ class CreateFile(Action):
         self.content = content
         self.mode = mode
         self._existed = False
-        self._backup: Optional[str] = None
+        self._patch: Optional[_Patch] = None
 
     def check(self) -> bool:
         cur = read_text(self.path)
@@ -122,17 +280,21 @@ class CreateFile(Action):
     def run(self) -> None:
         parent = self.path.parent
         ensure_dir(parent, exist_ok=True)
-        if self.path.exists():
-            self._existed = True
-            self._backup = read_text(self.path)
-        atomic_write(self.path, self.content.encode("utf-8"), mode=self.mode)
+        cur = read_text(self.path)
+        self._existed = cur is not None
+        data = self.content.encode("utf-8")
+        # Small brand-new files are written in place; existing content is replaced atomically
+        atomic_write(
+            self.path, data, mode=self.mode, atomic=bool(cur) or len(data) >= 4096
+        )
+        if cur is not None:
+            self._patch = _make_patch(cur, self.content)
 
     def rollback(self) -> None:
         try:
             if self._existed:
-                atomic_write(
-                    self.path, (self._backup or "").encode("utf-8"), mode=self.mode
-                )
+                if self._patch is not None:
+                    _revert(self.path, self._patch, self.mode)
             else:
                 if self.path.exists():
                     self.path.unlink(missing_ok=True)
@@ -147,17 +309,17 @@ class DeleteFile(Action):
         self._existed = False
 
     def check(self) -> bool:
-        return self.path.exists()
+        return _exists(self.path)
 
     def run(self) -> None:
-        if self.path.exists() and self.path.is_file():
+        if os.path.isfile(self.path):
             self._existed = True
             self._backup = self.path.read_bytes()
             self.path.unlink()
 
     def rollback(self) -> None:
         if self._existed and self._backup is not None:
-            self.path.parent.mkdir(parents=True, exist_ok=True)
+            ensure_dir(self.path.parent, mode=None)
             atomic_write(self.path, self._backup)
 
 
@@ -174,17 +336,20 @@ class CreateLink(Action):
         return True
 
     def run(self) -> None:
-        if self.link_path.exists() or self.link_path.is_symlink():
+        st = try_lstat(self.link_path)
+        if st is not None:
             self._existed = True
             try:
                 # If symlink, remember old target for rollback
-                if self.link_path.is_symlink():
+                if stat.S_ISLNK(st.st_mode):
                     self._backup = os.readlink(self.link_path)
                 self.link_path.unlink()
             except FileNotFoundError:
                 pass
-        self.link_path.parent.mkdir(parents=True, exist_ok=True)
+        ensure_dir(self.link_path.parent, mode=None)
         os.symlink(self.target, self.link_path)
+        # Directories seen through the old link (if any) are no longer there
+        forget_dir(self.link_path)
 
     def rollback(self) -> None:
         try:
@@ -193,6 +358,7 @@ class CreateLink(Action):
             if self._existed:
                 if self._backup is not None:
                     os.symlink(self._backup, self.link_path)
+            forget_dir(self.link_path)
         except Exception:
             pass
 
@@ -204,16 +370,18 @@ class DeleteLink(Action):
         self._existed = False
 
     def check(self) -> bool:
-        return self.link_path.is_symlink()
+        st = try_lstat(self.link_path)
+        return st is not None and stat.S_ISLNK(st.st_mode)
 
     def run(self) -> None:
-        if self.link_path.is_symlink():
+        if self.check():
             self._existed = True
             try:
                 self._backup = os.readlink(self.link_path)
             except OSError:
                 self._backup = None
             self.link_path.unlink()
+            forget_dir(self.link_path)
 
     def rollback(self) -> None:
         if self._existed and self._backup:
@@ -230,13 +398,22 @@ class AppendFile(Action):
         self._appended = False
 
     def check(self) -> bool:
-        cur = read_text(self.path)
-        if cur is None:
+        # Only the tail matters: the last line plus its terminator, which may
+        # be "\r\n" or "\r" (text-mode reads used to fold those into "\n")
+        line = self.line.encode("utf-8")
+        tail = tail_bytes(self.path, len(line) + 2)
+        if tail is None:
+            return True
+        if tail.endswith(b"\r\n"):
+            tail = tail[:-2]
+        elif tail.endswith((b"\n", b"\r")):
+            tail = tail[:-1]
+        else:
             return True
-        return not cur.endswith(self.line + "\n")
+        return not tail.endswith(line)
 
     def run(self) -> None:
-        self.path.parent.mkdir(parents=True, exist_ok=True)
+        ensure_dir(self.path.parent, mode=None)
         with self.path.open("a", encoding="utf-8") as f:
             f.write(self.line + "\n")
         self._appended = True
@@ -257,7 +434,7 @@ class AppendFile(Action):
             pass
 
 
-class EnsureLinePresent(Action):
+class EnsureLinePresent(TextEdit):
     """Ensure a line exists somewhere in the file; append if missing.
 
     - Idempotent: does nothing if the exact line already exists (compared without trailing newline).
@@ -267,32 +444,32 @@ class EnsureLinePresent(Action):
     def __init__(self, path: str | Path, line: str) -> None:
         self.path = Path(path)
         self.line = line.rstrip("\n")
+        self._needle = "\n" + self.line + "\n"
         self._appended = False
 
-    def check(self) -> bool:
-        content = read_text(self.path)
-        if content is None:
+    def _needs(self, text: Optional[str]) -> bool:
+        if text is None:
             return True
-        for ln in content.splitlines():
-            if ln == self.line:
-                return False
-        return True
+        return not _has_line(text, self._needle)
+
+    def _edit(self, text: Optional[str]) -> str:
+        if text is None or text == "":
+            return self.line + "\n"
+        # ensure file ends with newline before appending
+        if not text.endswith("\n"):
+            return text + "\n" + self.line + "\n"
+        return text + self.line + "\n"
+
+    def check(self) -> bool:
+        return self._needs(read_text(self.path))
 
     def run(self) -> None:
-        self.path.parent.mkdir(parents=True, exist_ok=True)
+        ensure_dir(self.path.parent, mode=None)
         try:
             content = read_text(self.path)
         except Exception:
             content = None
-        if content is None or content == "":
-            new_content = self.line + "\n"
-        else:
-            # ensure file ends with newline before appending
-            if not content.endswith("\n"):
-                new_content = content + "\n" + self.line + "\n"
-            else:
-                new_content = content + self.line + "\n"
-        atomic_write(self.path, new_content.encode("utf-8"))
+        atomic_write(self.path, self._edit(content).encode("utf-8"))
         self._appended = True
 
     def rollback(self) -> None:
@@ -318,31 +495,39 @@ class EnsureLinePresent(Action):
 class RemoveLastLine(Action):
     def __init__(self, path: str | Path) -> None:
         self.path = Path(path)
-        self._backup: Optional[str] = None
+        # Only the removed tail is kept for rollback, not the whole file
+        self._backup: Optional[bytes] = None
         self._changed = False
 
     def check(self) -> bool:
-        return self.path.exists()
+        return _exists(self.path)
 
     def run(self) -> None:
-        if not self.path.exists():
-            return
-        self._backup = read_text(self.path) or ""
-        lines = self._backup.splitlines()
-        if not lines:
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
             return
-        lines = lines[:-1]
-        atomic_write(
-            self.path, ("\n".join(lines) + ("\n" if lines else "")).encode("utf-8")
-        )
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                end = size
+                if m[end - 1 : end] == b"\n":
+                    end -= 1
+                nl = m.rfind(b"\n", 0, end)
+                new_len = 0 if nl < 0 else nl + 1
+                self._backup = m[new_len:]
+        os.truncate(self.path, new_len)
         self._changed = True
 
     def rollback(self) -> None:
         if self._changed and self._backup is not None:
-            atomic_write(self.path, self._backup.encode("utf-8"))
+            with open(self.path, "ab") as f:
+                f.write(self._backup)
 
 
-class EnsureLineAbsent(Action):
+class EnsureLineAbsent(TextEdit):
     """Ensure a specific line is absent from the file; remove if present.
 
     By default removes all occurrences of the exact line (without trailing newline).
@@ -352,20 +537,36 @@ class EnsureLineAbsent(Action):
         self.path = Path(path)
         self.line = line.rstrip("\n")
         self.remove_all = remove_all
-        self._backup: Optional[str] = None
+        self._needle = "\n" + self.line + "\n"
+        self._patch: Optional[_Patch] = None
 
-    def check(self) -> bool:
-        content = read_text(self.path)
-        if content is None:
+    def _needs(self, text: Optional[str]) -> bool:
+        if text is None:
             return False
-        return any(ln == self.line for ln in content.splitlines())
+        return _has_line(text, self._needle)
+
+    def _edit(self, text: Optional[str]) -> str:
+        text = text or ""
+        needle = self._needle
+        if not _has_line(text, needle):
+            return text
+        if "\r" in text:
+            return self._edit_lines(text)
+        # Pad so the first and last lines are newline-bounded too
+        padded = "\n" + text if text.endswith("\n") else "\n" + text + "\n"
+        if self.remove_all:
+            # Adjacent occurrences share a newline, so one pass may leave some
+            while needle in padded:
+                padded = padded.replace(needle, "\n")
+        else:
+            # remove only the last occurrence
+            i = padded.rfind(needle)
+            padded = padded[:i] + padded[i + len(needle) - 1 :]
+        return padded[1:]
 
-    def run(self) -> None:
-        content = read_text(self.path)
-        if content is None:
-            return
-        self._backup = content
-        lines = content.splitlines()
+    def _edit_lines(self, text: str) -> str:
+        # Line by line, for files with CRLF/CR line endings
+        lines = text.splitlines()
         if self.remove_all:
             new_lines = [ln for ln in lines if ln != self.line]
         else:
@@ -375,18 +576,24 @@ class EnsureLineAbsent(Action):
                 if new_lines[i] == self.line:
                     del new_lines[i]
                     break
-        if new_lines == lines:
+        return "\n".join(new_lines) + ("\n" if new_lines else "")
+
+    def check(self) -> bool:
+        return self._needs(read_text(self.path))
+
+    def run(self) -> None:
+        content = read_text(self.path)
+        if content is None or not self._needs(content):
             return
-        atomic_write(
-            self.path,
-            ("\n".join(new_lines) + ("\n" if new_lines else "")).encode("utf-8"),
-        )
+        new_content = self._edit(content)
+        atomic_write(self.path, new_content.encode("utf-8"))
+        self._patch = _make_patch(content, new_content)
 
     def rollback(self) -> None:
-        if self._backup is None:
+        if self._patch is None:
             return
         try:
-            atomic_write(self.path, self._backup.encode("utf-8"))
+            _revert(self.path, self._patch)
         except Exception:
             pass
 
@@ -426,6 +633,53 @@ class SystemdStop(Action):
             pass
 
 
+class SystemdBatch(Action):
+    """Consecutive SystemdStart (or SystemdStop) actions run as one systemctl call.
+
+    If the batched call fails, each unit is retried on its own, and only units
+    that still fail are rolled back, as if the actions had run one by one.
+    """
+
+    def __init__(self, actions: Sequence[SystemdStart | SystemdStop]) -> None:
+        self.actions = list(actions)
+        start = isinstance(self.actions[0], SystemdStart)
+        self.verb, self._undo = ("start", "stop") if start else ("stop", "start")
+        self.units = list(dict.fromkeys(a.unit for a in self.actions))
+        self._failed: List[str] = []
+
+    def check(self) -> bool:
+        return True
+
+    def run(self) -> None:
+        self._failed = []
+        try:
+            run_systemctl(self.verb, *self.units)
+            return
+        except subprocess.CalledProcessError:
+            pass
+        err: Optional[subprocess.CalledProcessError] = None
+        for unit in self.units:
+            try:
+                run_systemctl(self.verb, unit)
+            except subprocess.CalledProcessError as e:
+                self._failed.append(unit)
+                err = e
+        if err is not None:
+            raise subprocess.CalledProcessError(
+                err.returncode, ["systemctl", self.verb, *self._failed]
+            )
+
+    def rollback(self) -> None:
+        for unit in self._failed:
+            try:
+                run_systemctl(self._undo, unit)
+            except Exception:
+                pass
+
+    def describe(self) -> str:
+        return f"SystemdBatch({self.verb} {' '.join(self.units)})"
+
+
 class UfwAllow(Action):
     def __init__(self, spec: str) -> None:
         self.spec = spec
@@ -460,7 +714,7 @@ class UfwDeny(Action):
             pass
 
 
-class EnsureBlockPresent(Action):
+class EnsureBlockPresent(TextEdit):
     """Ensure a managed block (between BEGIN/END markers) exists and equals given content.
 
     The block is marked by lines like:
@@ -481,82 +735,61 @@ class EnsureBlockPresent(Action):
         self.key = key
         self.content = content.rstrip("\n")
         self.prefix = comment_prefix
+        self._begin = f"{comment_prefix} BEGIN MANAGED:{key}"
+        self._end = f"{comment_prefix} END MANAGED:{key}"
         self._existed = False
-        self._backup: Optional[str] = None
+        self._patch: Optional[_Patch] = None
 
-    def _find_block(self, text: str) -> tuple[int, int] | None:
-        begin = f"{self.prefix} BEGIN MANAGED:{self.key}"
-        end = f"{self.prefix} END MANAGED:{self.key}"
-        lines = text.splitlines()
-        start_idx = -1
-        for i, ln in enumerate(lines):
-            if ln.strip() == begin:
-                start_idx = i
-                break
-        if start_idx == -1:
-            return None
-        for j in range(start_idx + 1, len(lines)):
-            if lines[j].strip() == end:
-                return start_idx, j
-        # malformed (begin without end) -> treat as no block
-        return None
+    def _find_block(self, text: str) -> tuple[int, int, int, int] | None:
+        return _block_span(text, self._begin, self._end)
 
-    def check(self) -> bool:
-        cur = read_text(self.path)
-        if cur is None:
+    def _needs(self, text: Optional[str]) -> bool:
+        if text is None:
             return True
-        rng = self._find_block(cur)
+        rng = self._find_block(text)
         if rng is None:
             return True
-        i, j = rng
-        lines = cur.splitlines()
-        current_block = "\n".join(lines[i + 1 : j]).rstrip("\n")
-        return current_block != self.content
+        _, i, j, _ = rng
+        return text[i:j].rstrip("\n") != self.content
+
+    def check(self) -> bool:
+        return self._needs(read_text(self.path))
 
     def run(self) -> None:
-        self.path.parent.mkdir(parents=True, exist_ok=True)
+        ensure_dir(self.path.parent, mode=None)
         cur = read_text(self.path)
         if cur is None:
             cur = ""
             self._existed = False
         else:
             self._existed = True
-        self._backup = cur
+        new_text = self._edit(cur)
+        atomic_write(self.path, new_text.encode("utf-8"))
+        self._patch = _make_patch(cur, new_text)
 
-        begin = f"{self.prefix} BEGIN MANAGED:{self.key}"
-        end = f"{self.prefix} END MANAGED:{self.key}"
-        lines = cur.splitlines()
+    def _edit(self, text: Optional[str]) -> str:
+        cur = text or ""
         rng = self._find_block(cur)
-        block_lines = [begin, *self.content.splitlines(), end]
+        block = "\n".join([self._begin, *self.content.splitlines(), self._end]) + "\n"
 
         if rng is None:
             # append block to end, keep one trailing newline
             if cur and not cur.endswith("\n"):
-                new_text = cur + "\n" + "\n".join(block_lines) + "\n"
-            else:
-                new_text = (
-                    cur
-                    + ("" if cur.endswith("\n") else "")
-                    + "\n".join(block_lines)
-                    + "\n"
-                )
-        else:
-            i, j = rng
-            new_lines = lines[:i] + block_lines + lines[j + 1 :]
-            new_text = "\n".join(new_lines) + "\n"
-
-        atomic_write(self.path, new_text.encode("utf-8"))
+                return cur + "\n" + block
+            return cur + block
+        start, _, _, stop = rng
+        return cur[:start] + block + cur[stop:]
 
     def rollback(self) -> None:
-        if self._backup is None:
+        if self._patch is None:
             return
         try:
-            atomic_write(self.path, self._backup.encode("utf-8"))
+            _revert(self.path, self._patch)
         except Exception:
             pass
 
 
-class EnsureBlockAbsent(Action):
+class EnsureBlockAbsent(TextEdit):
     """Ensure a managed block (BEGIN/END markers) for the given key is absent.
 
     If the block exists, remove it. Otherwise, do nothing. Rollback restores the original file.
@@ -566,51 +799,92 @@ class EnsureBlockAbsent(Action):
         self.path = Path(path)
         self.key = key
         self.prefix = comment_prefix
-        self._backup: Optional[str] = None
+        self._begin = f"{comment_prefix} BEGIN MANAGED:{key}"
+        self._end = f"{comment_prefix} END MANAGED:{key}"
+        self._patch: Optional[_Patch] = None
 
-    def _find_block(self, text: str) -> tuple[int, int] | None:
-        begin = f"{self.prefix} BEGIN MANAGED:{self.key}"
-        end = f"{self.prefix} END MANAGED:{self.key}"
-        lines = text.splitlines()
-        start_idx = -1
-        for i, ln in enumerate(lines):
-            if ln.strip() == begin:
-                start_idx = i
-                break
-        if start_idx == -1:
-            return None
-        for j in range(start_idx + 1, len(lines)):
-            if lines[j].strip() == end:
-                return start_idx, j
-        return None
+    def _find_block(self, text: str) -> tuple[int, int, int, int] | None:
+        return _block_span(text, self._begin, self._end)
 
-    def check(self) -> bool:
-        cur = read_text(self.path)
-        if cur is None:
+    def _needs(self, text: Optional[str]) -> bool:
+        if text is None:
             return False
-        return self._find_block(cur) is not None
+        return self._find_block(text) is not None
+
+    def _edit(self, text: Optional[str]) -> str:
+        cur = text or ""
+        rng = self._find_block(cur)
+        if rng is None:
+            return cur
+        start, _, _, stop = rng
+        return cur[:start] + cur[stop:]
+
+    def check(self) -> bool:
+        return self._needs(read_text(self.path))
 
     def run(self) -> None:
         cur = read_text(self.path)
-        if cur is None:
+        if cur is None or self._find_block(cur) is None:
             return
-        self._backup = cur
-        lines = cur.splitlines()
-        rng = self._find_block(cur)
-        if rng is None:
+        new_text = self._edit(cur)
+        atomic_write(self.path, new_text.encode("utf-8"))
+        self._patch = _make_patch(cur, new_text)
+
+    def rollback(self) -> None:
+        if self._patch is None:
             return
-        i, j = rng
-        new_lines = lines[:i] + lines[j + 1 :]
-        atomic_write(
-            self.path,
-            ("\n".join(new_lines) + ("\n" if new_lines else "")).encode("utf-8"),
-        )
+        try:
+            _revert(self.path, self._patch)
+        except Exception:
+            pass
+
+
+class CoalescedTextEdit(Action):
+    """Consecutive TextEdits of one file applied in memory and written once.
+
+    Each edit is applied only if it is still needed after the ones before it,
+    mirroring running them one by one. Rollback restores the original file.
+    """
+
+    def __init__(self, edits: Sequence[TextEdit]) -> None:
+        self.edits = list(edits)
+        self.path = self.edits[0].path
+        self._existed = False
+        self._patch: Optional[_Patch] = None
+        self._written = False
+
+    def _apply(self, text: Optional[str]) -> Optional[str]:
+        for e in self.edits:
+            if e._needs(text):
+                text = e._edit(text)
+        return text
+
+    def check(self) -> bool:
+        cur = read_text(self.path)
+        return self._apply(cur) != cur
+
+    def run(self) -> None:
+        ensure_dir(self.path.parent, mode=None)
+        cur = read_text(self.path)
+        new = self._apply(cur)
+        if new is None or new == cur:
+            return
+        self._existed = cur is not None
+        atomic_write(self.path, new.encode("utf-8"))
+        self._written = True
+        if cur is not None:
+            self._patch = _make_patch(cur, new)
 
     def rollback(self) -> None:
-        if self._backup is None:
+        if not self._written:
             return
         try:
-            atomic_write(self.path, self._backup.encode("utf-8"))
+            if not self._existed:
+                self.path.unlink(missing_ok=True)
+            elif self._patch is not None:
+                _revert(self.path, self._patch)
         except Exception:
             pass
 
+    def describe(self) -> str:
+        return "; ".join(e.describe() for e in self.edits)
@@ -1,12 +1,122 @@
 from __future__ import annotations
 
-from typing import Callable, Dict, List, Set, Tuple
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Mapping, Sequence, Set, Tuple
 
 from .package import Package
 
 
 Op = str  # "install" | "update" | "skip" | "uninstall"
 
+# Below this many nodes the interpreter loop beats importing/compiling with numba
+_JIT_MIN_NODES = 2000
+_jit_kahn: Any = None
+
+
+def _kahn(indptr: Any, indices: Any, in_degree: Any, out: Any) -> int:
+    """
+    Kahn's algorithm over a CSR graph whose edges point from a node to its dependents.
+    Writes the order into `out` and returns how many nodes were placed.
+    """
+    n = len(in_degree)
+    head = 0
+    tail = 0
+    for i in range(n):
+        if in_degree[i] == 0:
+            out[tail] = i
+            tail += 1
+    while head < tail:
+        u = out[head]
+        head += 1
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            in_degree[v] -= 1
+            if in_degree[v] == 0:
+                out[tail] = v
+                tail += 1
+    return tail
+
+
+def _load_jit_kahn() -> Any:
+    """Return a numba-compiled _kahn, or None when numba/numpy are unavailable."""
+    global _jit_kahn
+    if _jit_kahn is None:
+        try:
+            from numba import njit
+        except ImportError:
+            _jit_kahn = False
+        else:
+            _jit_kahn = njit(cache=True)(_kahn)
+    return _jit_kahn or None
+
+
+def _topo_order(
+    nodes: Sequence[str], deps: Mapping[str, Sequence[str]], strict: bool = True
+) -> List[str]:
+    """
+    Order `nodes` so that every node comes after its `deps` (which must be within nodes).
+    Raises on a cycle unless `strict` is False, in which case the nodes on or behind
+    a cycle are appended depth-first in their original order, each cycle broken where
+    the walk first comes back to it.
+    """
+    n = len(nodes)
+    ids = {name: i for i, name in enumerate(nodes)}
+    dependents: List[List[int]] = [[] for _ in range(n)]
+    in_degree = [0] * n
+    for i, name in enumerate(nodes):
+        for dep in deps.get(name, ()):
+            dependents[ids[dep]].append(i)
+            in_degree[i] += 1
+    indptr = [0] * (n + 1)
+    indices: List[int] = []
+    for i, ds in enumerate(dependents):
+        indices.extend(ds)
+        indptr[i + 1] = len(indices)
+
+    kahn = _load_jit_kahn() if n >= _JIT_MIN_NODES else None
+    if kahn is not None:
+        import numpy as np
+
+        in_deg = np.array(in_degree, dtype=np.int32)
+        out = np.empty(n, dtype=np.int32)
+        tail = kahn(
+            np.array(indptr, dtype=np.int32),
+            np.array(indices, dtype=np.int32),
+            in_deg,
+            out,
+        )
+    else:
+        in_deg = in_degree
+        out = [0] * n
+        tail = _kahn(indptr, indices, in_deg, out)
+
+    if tail != n and not strict:
+        order = [nodes[i] for i in out[:tail]]
+        visited: Set[int] = set()
+
+        def visit(i: int) -> None:
+            visited.add(i)
+            for d in deps.get(nodes[i], ()):
+                j = ids[d]
+                if in_deg[j] > 0 and j not in visited:
+                    visit(j)
+            order.append(nodes[i])
+
+        for i in range(n):
+            if in_deg[i] > 0 and i not in visited:
+                visit(i)
+        return order
+    if tail != n:
+        # Left-over nodes are on a cycle or depend on one; walking left-over
+        # deps from any of them must come back to a node that is on a cycle
+        i = next(i for i in range(n) if in_deg[i] > 0)
+        walked: Set[int] = set()
+        while i not in walked:
+            walked.add(i)
+            i = next(ids[d] for d in deps[nodes[i]] if in_deg[ids[d]] > 0)
+        raise ValueError(f"Cycle detected at {nodes[i]}")
+    return [nodes[i] for i in out]
+
 
 def resolve_install_order(
     targets: List[str],
@@ -15,30 +125,27 @@ def resolve_install_order(
 ) -> List[Tuple[Package, Op]]:
     """
     Return a topo-sorted list of (Package, op) for install/update.
+
+    `repo_lookup` is called once per package name; callers resolving several
+    plans in one process should pass a cached lookup.
     """
+    # Collect the transitive closure of targets breadth-first
     graph: Dict[str, Package] = {}
-    visiting: Set[str] = set()
-    visited: Set[str] = set()
-    order: List[str] = []
-
-    def visit(name: str) -> None:
-        if name in visited:
-            return
-        if name in visiting:
-            raise ValueError(f"Cycle detected at {name}")
-        visiting.add(name)
-        pkg = graph.get(name)
-        if pkg is None:
-            pkg = repo_lookup(name)
-            graph[name] = pkg
+    worklist: Deque[str] = deque(targets)
+    seen: Set[str] = set(targets)
+    while worklist:
+        name = worklist.popleft()
+        pkg = repo_lookup(name)
+        graph[name] = pkg
         for dep in pkg.dependencies:
-            visit(dep)
-        visiting.remove(name)
-        visited.add(name)
-        order.append(name)
+            if dep not in seen:
+                seen.add(dep)
+                worklist.append(dep)
 
-    for t in targets:
-        visit(t)
+    # Dependencies come before their dependents
+    order = _topo_order(
+        list(graph), {name: pkg.dependencies for name, pkg in graph.items()}
+    )
 
     result: List[Tuple[Package, Op]] = []
     for name in order:
@@ -87,29 +194,22 @@ def resolve_uninstall_order(
 
     # Compute closure (targets + all their deps that are also in targets)
     # For safety we only uninstall exactly requested targets (no autoremove).
-    closure = target_set
-
-    # Order: reverse topological among closure
-    visited: Set[str] = set()
-    order: List[str] = []
-
-    def visit(name: str) -> None:
-        if name in visited:
-            return
-        visited.add(name)
-        for dep in graph.get(name, Package(name, installed.get(name, ""), [])).dependencies:
-            if dep in closure:
-                visit(dep)
-        order.append(name)
-
-    for t in closure:
-        visit(t)
-
+    closure = list(dict.fromkeys(targets))
+
+    # Dependencies of each closure member restricted to the closure, read once
+    deps: Dict[str, List[str]] = {
+        n: [d for d in dict.fromkeys(graph[n].dependencies) if d in target_set]
+        for n in closure
+        if n in graph
+    }
+
+    # Order: reverse topological among closure; a cycle among the targets
+    # must not block removing them
+    order = _topo_order(closure, deps, strict=False)
     order.reverse()
     result: List[Tuple[Package, Op]] = []
     for name in order:
         if name not in installed:
             continue
-        pkg = graph.get(name, Package(name, installed[name]))
-        result.append((pkg, "uninstall"))
-    return result
\ No newline at end of file
+        result.append((graph[name], "uninstall"))
+    return result
@@ -1,9 +1,20 @@
 from __future__ import annotations
 
-from typing import Iterable
+from typing import Any, Callable, Iterable, List, Optional, Sequence
 import sys
 
-from .action import Action
+from ..utils.fs import FileCache, forget_dir, use_file_cache
+from ..utils.sysutils import ShellSession, set_active_shell
+from .action import (
+    Action,
+    CoalescedTextEdit,
+    RunCommand,
+    RunShell,
+    SystemdBatch,
+    SystemdStart,
+    SystemdStop,
+    TextEdit,
+)
 
 
 def query_before_action(act: Action) -> bool:
@@ -53,23 +64,113 @@ def run_action(act: Action) -> None:
                 return  # User chose to skip, exit the loop
 
 
+def _coalesce(
+    actions: Iterable[Action],
+    key: Callable[[Action], Any],
+    merge: Callable[[Sequence[Action]], Action],
+) -> List[Action]:
+    """Replace each run of 2+ consecutive actions with the same non-None key by merge(run)."""
+    out: List[Action] = []
+    run: List[Action] = []
+    run_key: Any = None
+
+    def flush() -> None:
+        if len(run) > 1:
+            out.append(merge(run))
+        else:
+            out.extend(run)
+        run.clear()
+
+    for act in actions:
+        k = key(act)
+        if k is None or k != run_key:
+            flush()
+        run_key = k
+        if k is None:
+            out.append(act)
+        else:
+            run.append(act)
+    flush()
+    return out
+
+
+def coalesce_text_edits(actions: Iterable[Action]) -> List[Action]:
+    """
+    Merge consecutive TextEdits of the same file into one CoalescedTextEdit,
+    so the file is read and written once instead of once per edit.
+    """
+    return _coalesce(
+        actions,
+        lambda a: a.path if isinstance(a, TextEdit) else None,
+        CoalescedTextEdit,
+    )
+
+
+def coalesce_systemctl(actions: Iterable[Action]) -> List[Action]:
+    """
+    Merge consecutive SystemdStart (or SystemdStop) actions into one SystemdBatch,
+    so their units are handled by a single systemctl call.
+    """
+    return _coalesce(
+        actions,
+        lambda a: type(a) if isinstance(a, (SystemdStart, SystemdStop)) else None,
+        SystemdBatch,
+    )
+
+
+def _touched_path(act: Action) -> Optional[str]:
+    """The one path act may modify, or None if it may touch anything."""
+    if isinstance(act, (RunCommand, RunShell)):
+        return None
+    path = getattr(act, "path", None) or getattr(act, "link_path", None)
+    return None if path is None else str(path)
+
+
 class Executor:
     """
     Execute actions with rollback on failure.
     - If action.check() returns False, it will be skipped.
+    - Used as a context manager, RunShell scripts share one /bin/sh session.
+    - File reads by check()/run() are cached per Executor and dropped for
+      whatever each executed action may have modified.
+    - Without confirmation, consecutive edits of one text file are coalesced
+      into a single write, and consecutive unit starts/stops into a single
+      systemctl call (see coalesce_text_edits, coalesce_systemctl).
     """
 
     def __init__(self) -> None:
-        pass
+        self._shell: ShellSession | None = None
+        self._files = FileCache()
+
+    def __enter__(self) -> Executor:
+        self._shell = ShellSession()
+        set_active_shell(self._shell)
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        set_active_shell(None)
+        if self._shell is not None:
+            self._shell.close()
+            self._shell = None
+
+    def _forget(self, act: Action) -> None:
+        path = _touched_path(act)
+        if path is None:
+            # Commands may have changed anything, including removing directories
+            self._files.clear()
+            forget_dir()
+        else:
+            self._files.invalidate(path)
 
     def run(self, actions: Iterable[Action], no_confirm: bool = False) -> None:
-        for act in actions:
-            if not act.check():
-                continue
-            if no_confirm:
+        if no_confirm:
+            actions = coalesce_systemctl(coalesce_text_edits(actions))
+        with use_file_cache(self._files):
+            for act in actions:
+                if not act.check():
+                    continue
+                if not no_confirm and not query_before_action(act):
+                    print(f"Skipping action: {act.describe()}")
+                    continue
                 run_action(act)
-                continue
-            if not query_before_action(act):
-                print(f"Skipping action: {act.describe()}")
-                continue
-            run_action(act)
+                self._forget(act)
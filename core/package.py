@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import List, Sequence
+import sys
+from dataclasses import dataclass
+from typing import Sequence, Tuple
 from .action import Action
 
 
@@ -9,16 +10,21 @@ from .action import Action
 class Package:
     name: str
     version: str
-    dependencies: List[str] = field(default_factory=list)
-    install: Sequence[Action] = field(default_factory=list)
-    uninstall: Sequence[Action] = field(default_factory=list)
-    update: Sequence[Action] = field(default_factory=list)
+    dependencies: Tuple[str, ...] = ()
+    # Omitted or empty action lists all share the immutable empty tuple
+    install: Sequence[Action] = ()
+    uninstall: Sequence[Action] = ()
+    update: Sequence[Action] = ()
 
     def __post_init__(self) -> None:
         if not self.name or not isinstance(self.name, str):
             raise ValueError("Package.name must be non-empty str")
         if not self.version or not isinstance(self.version, str):
             raise ValueError("Package.version must be non-empty str")
-        self.dependencies = list(self.dependencies or [])
+        # Accept any iterable of names; dep names repeat across packages, so intern them
+        self.dependencies = tuple(sys.intern(d) for d in self.dependencies or ())
+        self.install = self.install or ()
+        self.uninstall = self.uninstall or ()
+        self.update = self.update or ()
         # Actions are opaque objects implementing Action protocol (check/run/rollback)
 
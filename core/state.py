@@ -1,12 +1,36 @@
 from __future__ import annotations
 
 import json
+import os
+import pickle
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict, Optional, Tuple
 
 from ..config import STATE_FILE
+from ..utils.fs import atomic_write
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _loads(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _dumps(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(data, indent=2, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+# Bump when the sidecar's layout changes, so old sidecars are ignored
+_CACHE_FORMAT = 1
 
 
 @dataclass(slots=True)
@@ -19,12 +43,63 @@ class State:
     def __init__(self, path: Path = STATE_FILE) -> None:
         self.path = path
         self.installed: Dict[str, InstalledInfo] = {}
+        self._version_cache: Optional[Dict[str, str]] = None
+
+    @property
+    def cache_path(self) -> Path:
+        return self.path.with_suffix(".json.cache.pkl")
+
+    def _stat_key(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load_cache(self, key: Tuple[int, int]) -> Optional[Dict[str, InstalledInfo]]:
+        # The sidecar holds two pickles: the format and (mtime_ns, size) of
+        # state.json it was built from, followed by {name: (version, installed_at)}.
+        # Only builtins are pickled, so renaming or reshaping InstalledInfo
+        # can't break loading.
+        try:
+            with open(self.cache_path, "rb") as f:
+                if tuple(pickle.load(f)) != (_CACHE_FORMAT, *key):
+                    return None
+                return {
+                    name: InstalledInfo(version, installed_at)
+                    for name, (version, installed_at) in pickle.load(f).items()
+                }
+        except Exception:
+            return None
+
+    def _write_cache(self, key: Tuple[int, int]) -> None:
+        try:
+            installed = {
+                name: (info.version, info.installed_at)
+                for name, info in self.installed.items()
+            }
+            data = pickle.dumps((_CACHE_FORMAT, *key), pickle.HIGHEST_PROTOCOL)
+            data += pickle.dumps(installed, pickle.HIGHEST_PROTOCOL)
+            atomic_write(self.cache_path, data, mode=0o600)
+        except OSError:
+            pass
 
     def load(self) -> None:
-        if not self.path.exists():
+        self._version_cache = None
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
             self.installed = {}
             return
-        data = json.loads(self.path.read_text(encoding="utf-8"))
+        with f:
+            st = os.fstat(f.fileno())
+            key = (st.st_mtime_ns, st.st_size)
+            cached = self._load_cache(key)
+            if cached is not None:
+                self.installed = cached
+                return
+            raw = f.read()
+        data = _loads(raw)
         self.installed = {
             name: InstalledInfo(**info) for name, info in data.get("installed", {}).items()
         }
@@ -36,12 +111,22 @@ class State:
                 for name, info in self.installed.items()
             }
         }
-        self.path.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        atomic_write(self.path, _dumps(data))
+        key = self._stat_key()
+        if key is not None:
+            self._write_cache(key)
+
+    def version_map(self) -> Dict[str, str]:
+        if self._version_cache is None:
+            self._version_cache = {k: v.version for k, v in self.installed.items()}
+        return self._version_cache
 
     def mark_installed(self, name: str, version: str) -> None:
+        self._version_cache = None
         self.installed[name] = InstalledInfo(
             version=version, installed_at=datetime.now(timezone.utc).isoformat()
         )
 
     def mark_uninstalled(self, name: str) -> None:
-        self.installed.pop(name, None)
\ No newline at end of file
+        self._version_cache = None
+        self.installed.pop(name, None)
@@ -3,19 +3,24 @@ from __future__ import annotations
 import subprocess
 from pathlib import Path
 
+from ..utils.sysutils import run_spawn
+
 
 def git(cmd: list[str], cwd: Path, check: bool = True) -> subprocess.CompletedProcess:
-    return subprocess.run(
-        ["git", *cmd], cwd=str(cwd), check=check, capture_output=True, text=True
-    )
+    # `git -C` instead of cwd= keeps the call eligible for posix_spawn.
+    # Output stays bytes; callers decode only what they use.
+    return run_spawn(["git", "-C", str(cwd), *cmd], check=check, capture_output=True)
 
 
 def pull(repo_dir: Path) -> str:
     cp = git(["pull", "--ff-only"], cwd=repo_dir)
-    return cp.stdout.strip()
+    return cp.stdout.decode("utf-8", "replace").strip()
 
 
-def show(repo_dir: Path, rev: str, path: str) -> str:
+def show_bytes(repo_dir: Path, rev: str, path: str) -> bytes:
     cp = git(["show", f"{rev}:{path}"], cwd=repo_dir)
     return cp.stdout
 
+
+def show(repo_dir: Path, rev: str, path: str) -> str:
+    return show_bytes(repo_dir, rev, path).decode("utf-8")
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
-import runpy
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
 # import sys
-# from pathlib import Path
 # from types import ModuleType
 
 from ..config import REPO_DIR
@@ -23,15 +26,62 @@ from ..core.package import Package
 #     return REPO_DIR
 
 
-def load_package(name: str) -> Package:
+@lru_cache(maxsize=None)
+def _exec_pkg(path: str, mtime_ns: int, size: int) -> Package:
+    # mtime_ns/size are part of the cache key only: an edited pkg.py is re-run
+    with open(path, "rb") as f:
+        code = compile(f.read(), path, "exec", dont_inherit=True)
+    # Same globals runpy.run_path would provide, minus its import machinery
+    globs = {
+        "__name__": "<run_path>",
+        "__file__": path,
+        "__cached__": None,
+        "__doc__": None,
+        "__loader__": None,
+        "__package__": None,
+        "__spec__": None,
+    }
+    exec(code, globs)
+    obj = globs.get("pkg")
+    if not isinstance(obj, Package):
+        raise InvalidPackageError(f"{path} must define `pkg: Package`")
+    return obj
+
+
+def repo_index(base: Path = REPO_DIR) -> Dict[str, os.DirEntry]:
+    """
+    Map package names to their directory entries with a single scandir of the repo.
+    """
+    try:
+        with os.scandir(base) as it:
+            return {e.name: e for e in it if e.is_dir()}
+    except FileNotFoundError:
+        return {}
+
+
+def load_package(
+    name: str, index: Optional[Mapping[str, os.DirEntry]] = None
+) -> Package:
     """
     Load a Package object from <REPO_DIR>/<name>/pkg.py expecting `pkg`.
+
+    With an `index` from repo_index(), unknown names are rejected without
+    touching the filesystem. The result is cached until pkg.py changes, so
+    repeated loads cost one stat.
     """
     # base = repo_dir()
     # pkg_file = base / name / "pkg.py"
-    pkg_file = REPO_DIR / name / "pkg.py"
-    if not pkg_file.exists():
-        raise PackageNotFoundError(name)
+    if index is not None:
+        entry = index.get(name)
+        if entry is None:
+            raise PackageNotFoundError(name)
+        pkg_file = Path(entry.path, "pkg.py")
+    else:
+        pkg_file = REPO_DIR / name / "pkg.py"
+    try:
+        st = os.stat(pkg_file)
+    except FileNotFoundError:
+        raise PackageNotFoundError(name) from None
 
     # _ensure_core_alias()
     # Ensure project root is in sys.path for imports
@@ -39,8 +89,4 @@ def load_package(name: str) -> Package:
     # if str(project_root) not in sys.path:
     #     sys.path.insert(0, str(project_root))
 
-    globs = runpy.run_path(str(pkg_file))
-    obj = globs.get("pkg")
-    if not isinstance(obj, Package):
-        raise InvalidPackageError(f"{pkg_file} must define `pkg: Package`")
-    return obj
+    return _exec_pkg(str(pkg_file), st.st_mtime_ns, st.st_size)
@@ -1,35 +1,169 @@
 from __future__ import annotations
 
+import errno
 import os
 import shutil
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterator, Optional, Tuple
 
 
-def ensure_dir(path: Path, mode: int = 0o755, exist_ok: bool = True) -> None:
+# Directories this process has created or chmod'ed, with the mode applied
+# (None for none), so repeated ensure_dir calls skip the mkdir/chmod syscalls
+_known_dirs: Dict[str, Optional[int]] = {}
+
+
+def ensure_dir(path: Path, mode: Optional[int] = 0o755, exist_ok: bool = True) -> None:
+    key = os.fspath(path)
+    if exist_ok and key in _known_dirs and _known_dirs[key] == mode:
+        return
     path.mkdir(parents=True, exist_ok=exist_ok)
     if mode is not None:
         os.chmod(path, mode)
+    _known_dirs[key] = mode
+
+
+def forget_dir(path: Optional[Path] = None) -> None:
+    """
+    Drop path and everything below it from ensure_dir's cache once it may have
+    been removed; with no path (e.g. after an arbitrary command), drop all.
+    """
+    if path is None:
+        _known_dirs.clear()
+        return
+    key = os.fspath(path)
+    prefix = key.rstrip(os.sep) + os.sep
+    for k in list(_known_dirs):
+        if k == key or k.startswith(prefix):
+            _known_dirs.pop(k, None)
 
 
-def atomic_write(path: Path, data: bytes, mode: int = 0o644) -> None:
+def atomic_write(
+    path: Path, data: bytes, mode: int = 0o644, *, atomic: bool = True
+) -> None:
+    """
+    Write data to path via a sibling temp file and os.replace.
+
+    The temp file lives in the same directory, so the rename is atomic and
+    no extra fsync is needed for readers to see either old or new content.
+    With atomic=False the file is written in place, saving the rename; only
+    use it where a torn write is harmless (e.g. a small freshly created file).
+    """
+    if not atomic:
+        try:
+            flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW
+            fd = os.open(path, flags, 0o600)
+        except OSError as e:
+            if e.errno != errno.ELOOP:
+                raise
+            # path is a symlink: replace the link itself, as the atomic path does
+        else:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            if mode is not None:
+                os.chmod(path, mode)
+            if _file_cache is not None:
+                _file_cache.invalidate(path)
+            return
     tmp = path.with_suffix(path.suffix + ".tmp")
     tmp.write_bytes(data)
     os.replace(tmp, path)
     if mode is not None:
         os.chmod(path, mode)
+    if _file_cache is not None:
+        _file_cache.invalidate(path)
+
+
+class FileCache:
+    """
+    Decoded file contents keyed by path and validated against (st_mtime_ns, st_size),
+    so a hit costs one stat instead of an open and a full read.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Tuple[int, int, str]] = {}
+
+    def get(self, path: Path) -> Optional[str]:
+        key = os.fspath(path)
+        try:
+            st = os.stat(key)
+        except FileNotFoundError:
+            self._entries.pop(key, None)
+            return None
+        hit = self._entries.get(key)
+        if hit is not None and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            return hit[2]
+        with open(key, "rb") as f:
+            text = f.read().decode("utf-8")
+        self._entries[key] = (st.st_mtime_ns, st.st_size, text)
+        return text
+
+    def invalidate(self, path: Path | str) -> None:
+        self._entries.pop(os.fspath(path), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_file_cache: Optional[FileCache] = None
+
+
+@contextmanager
+def use_file_cache(cache: FileCache) -> Iterator[FileCache]:
+    """Route read_text through cache for the duration of the block."""
+    global _file_cache
+    prev, _file_cache = _file_cache, cache
+    try:
+        yield cache
+    finally:
+        _file_cache = prev
 
 
 def read_text(path: Path) -> Optional[str]:
+    if _file_cache is not None:
+        return _file_cache.get(path)
+    try:
+        with open(path, "rb") as f:
+            return f.read().decode("utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def tail_bytes(path: Path, n: int) -> Optional[bytes]:
+    """Return the last n bytes of path (fewer if the file is shorter), or None if missing."""
     try:
-        return path.read_text(encoding="utf-8")
+        fd = os.open(path, os.O_RDONLY)
     except FileNotFoundError:
         return None
+    try:
+        size = os.fstat(fd).st_size
+        start = max(0, size - n)
+        return os.pread(fd, size - start, start)
+    finally:
+        os.close(fd)
+
+
+def try_lstat(path: Path) -> Optional[os.stat_result]:
+    """lstat path, or None if it does not exist."""
+    try:
+        return os.lstat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def is_empty_dir(path: Path) -> bool:
+    """True if path is a directory (following symlinks) with no entries."""
+    try:
+        with os.scandir(path) as it:
+            return next(it, None) is None
+    except (FileNotFoundError, NotADirectoryError):
+        return False
 
 
 def is_link_to(path: Path, target: Path) -> bool:
+    # readlink fails with EINVAL on non-links, so no separate lstat is needed
     try:
-        return path.is_symlink() and Path(os.readlink(path)) == target
+        return Path(os.readlink(path)) == target
     except OSError:
         return False
 
@@ -39,4 +173,5 @@ def remove_path(path: Path) -> None:
         path.unlink(missing_ok=True)
     elif path.is_dir():
         shutil.rmtree(path)
+        forget_dir(path)
 
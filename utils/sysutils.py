@@ -1,21 +1,178 @@
 from __future__ import annotations
 
+import fcntl
+import os
+import shlex
 import shutil
 import subprocess
+import threading
+from functools import lru_cache
+from typing import Any, Optional, Sequence
+
+from ..config import SHELL_ENV
+
+
+# Only positive hits are used, so a command installed later is still found
+_resolve = lru_cache(maxsize=None)(shutil.which)
 
 
 def have(cmd: str) -> bool:
-    return shutil.which(cmd) is not None
+    # A found command stays found; a miss is looked up again (it may have been
+    # installed by an earlier action), so only misses walk PATH repeatedly
+    return _resolve(cmd) is not None or shutil.which(cmd) is not None
+
+
+def run_spawn(
+    argv: Sequence[str], cwd: Optional[str] = None, **kwargs: Any
+) -> subprocess.CompletedProcess:
+    """
+    subprocess.run arranged so CPython can take its posix_spawn fast path.
 
+    That path needs an absolute executable, close_fds=False (our own fds are
+    non-inheritable anyway), no cwd and no preexec_fn/process_group; with a
+    cwd this is plain subprocess.run.
+    """
+    if cwd is None and argv:
+        exe = _resolve(argv[0])
+        if exe is not None:
+            kwargs.setdefault("executable", exe)
+            kwargs.setdefault("close_fds", False)
+    return subprocess.run(argv, cwd=cwd, **kwargs)
 
-def run_systemctl(action: str, unit: str) -> None:
+
+def run_systemctl(action: str, *units: str) -> None:
+    # systemctl takes any number of units, so batches cost a single process
     if not have("systemctl"):
         raise RuntimeError("systemctl not found")
-    subprocess.run(["systemctl", action, unit], check=True)
+    subprocess.run(["systemctl", action, *units], check=True)
 
 
 def run_ufw(action: str, spec: str) -> None:
     if not have("ufw"):
         raise RuntimeError("ufw not found")
-    subprocess.run(["ufw", action, spec], check=True, input=b"y\n")
+    # --force answers ufw's confirmation prompt, so no stdin pipe is needed
+    subprocess.run(
+        ["ufw", "--force", action, spec], check=True, stdin=subprocess.DEVNULL
+    )
+
+
+class ShellSession:
+    """
+    A long-lived /bin/sh process that runs scripts one after another.
+
+    It is the same interpreter the one-off `/bin/sh -c` fallback uses, so a
+    script behaves alike whether or not the session is free to take it.
+    Each script is eval'ed in its own subshell (so `cd`, `exit` or variables
+    don't leak into the next one) with the caller's stdin/stdout/stderr, and its
+    exit status is reported back over a dedicated pipe.
+    """
+
+    # Where the child sees the caller's stdin and the status pipe; /bin/sh
+    # (e.g. dash) only accepts single-digit fds in redirections
+    _STDIN_FD = 3
+    _STATUS_FD = 4
+
+    def __init__(self) -> None:
+        self._pid: Optional[int] = None
+        self._cmds = None
+        self._status = None
+        self._lock = threading.Lock()
+        self._broken = False
+
+    def _start(self) -> bool:
+        if self._pid is not None:
+            return True
+        if self._broken:
+            return False
+        cmd_r, cmd_w = os.pipe()
+        st_r, st_w = os.pipe()
+        # Move the child's ends above the fds they are dup'ed onto
+        child_r = fcntl.fcntl(cmd_r, fcntl.F_DUPFD_CLOEXEC, 5)
+        child_w = fcntl.fcntl(st_w, fcntl.F_DUPFD_CLOEXEC, 5)
+        os.close(cmd_r)
+        os.close(st_w)
+        try:
+            self._pid = os.posix_spawn(
+                "/bin/sh",
+                ["sh"],
+                os.environ if SHELL_ENV is None else SHELL_ENV,
+                file_actions=[
+                    (os.POSIX_SPAWN_DUP2, 0, self._STDIN_FD),
+                    (os.POSIX_SPAWN_DUP2, child_r, 0),
+                    (os.POSIX_SPAWN_DUP2, child_w, self._STATUS_FD),
+                ],
+            )
+        except OSError:
+            os.close(cmd_w)
+            os.close(st_r)
+            self._broken = True
+            return False
+        finally:
+            os.close(child_r)
+            os.close(child_w)
+        self._cmds = os.fdopen(cmd_w, "w")
+        self._status = os.fdopen(st_r, "r")
+        return True
+
+    def run(self, script: str, cwd: Optional[str] = None) -> Optional[int]:
+        """Run script and return its exit status, or None if the session can't take it."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            if not self._start():
+                return None
+            assert self._cmds is not None and self._status is not None
+            body = f"eval {shlex.quote(script)}"
+            if cwd is not None:
+                body = f"cd -- {shlex.quote(cwd)} && {body}"
+            fd0, st = self._STDIN_FD, self._STATUS_FD
+            try:
+                self._cmds.write(
+                    f"( {body}\n) <&{fd0} {fd0}<&- {st}>&-; printf '%d\\n' $? >&{st}\n"
+                )
+                self._cmds.flush()
+            except OSError:
+                # The shell is gone; the caller falls back to a one-off /bin/sh
+                self._close()
+                self._broken = True
+                return None
+            line = self._status.readline()
+            if not line:
+                self._close()
+                self._broken = True
+                raise RuntimeError("shell session exited unexpectedly")
+            return int(line)
+        finally:
+            self._lock.release()
+
+    def _close(self) -> None:
+        if self._pid is None:
+            return
+        try:
+            try:
+                self._cmds.close()
+            except OSError:
+                # Unflushed commands hit a closed pipe; the shell is exiting anyway
+                pass
+            os.waitpid(self._pid, 0)
+        finally:
+            self._status.close()
+            self._pid = None
+            self._cmds = None
+            self._status = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+_active_shell: Optional[ShellSession] = None
+
+
+def active_shell() -> Optional[ShellSession]:
+    return _active_shell
+
 
+def set_active_shell(shell: Optional[ShellSession]) -> None:
+    global _active_shell
+    _active_shell = shell